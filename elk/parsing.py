@@ -1,10 +1,15 @@
 import re
+from functools import lru_cache
 
 from .training.losses import LOSSES
 
 
-def parse_loss(terms: list[str]) -> dict[str, float]:
-    """Parse the loss command line argument list into a dictionary."""
+@lru_cache(maxsize=128)
+def parse_loss(terms: tuple[str, ...]) -> dict[str, float]:
+    """Parse the loss command line argument list into a dictionary.
+
+    The result is cached, so callers must not mutate the returned dictionary.
+    """
     if len(terms) == 0:
         return {"ccs_prompt_var": 1.0}
     loss_dict = dict()
@@ -1,10 +1,11 @@
 """An ELK reporter network."""
 
 import math
-from copy import deepcopy
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import cache
 from pathlib import Path
-from typing import Literal, Optional, cast
+from typing import Callable, Literal, Optional, cast
 
 import torch
 import torch.nn as nn
@@ -16,10 +17,88 @@ from ..parsing import parse_loss
 from ..utils.typing import assert_type
 from .classifier import Classifier
 from .losses import LOSSES
+from .normalizer import Normalizer
 from .reporter import Reporter, ReporterConfig
 from .spectral_norm import SpectralNorm
 
 
+@contextmanager
+def _tf32_matmuls(enabled: bool):
+    """Temporarily allow TF32 tensor cores for FP32 matmuls if `enabled`.
+
+    The previous precision is restored on exit, so this only affects the code
+    inside the block rather than e.g. the model forward passes during extraction.
+    """
+    prev = torch.get_float32_matmul_precision()
+    if enabled:
+        torch.set_float32_matmul_precision("high")
+    try:
+        yield
+    finally:
+        torch.set_float32_matmul_precision(prev)
+
+
+@cache
+def _compile(fn: Callable) -> Callable:
+    """Compile `fn` once per process, so that every reporter shares its cache.
+
+    The reporter (or probe) is passed as an argument rather than bound, so Dynamo
+    guards on its structure instead of its identity and a new reporter for every
+    layer doesn't trigger a recompile.
+    """
+    return torch.compile(fn, mode="reduce-overhead", dynamic=False)
+
+
+def _maybe_compile(fn: Callable, device: torch.device) -> Callable:
+    """Return the compiled version of `fn` if it's worth it on `device`.
+
+    The probe is tiny, so training on the GPU is dominated by kernel launch
+    overhead, which Inductor can fuse away. On the CPU it doesn't pay off, and
+    Inductor's C++ backend needs a toolchain that not every machine has, so there
+    (and wherever Dynamo is unsupported) we run eagerly.
+    """
+    if device.type == "cuda" and torch._dynamo.is_dynamo_supported():
+        return _compile(fn)
+    return fn
+
+
+def _lossm_per_try(
+    reporter: "CcsReporter", logits: Tensor, labels: Optional[Tensor]
+) -> Tensor:
+    """Map `CcsReporter.lossm` over a leading "try" dimension of `logits`.
+
+    Uses `torch.func.vmap`, so the loss kernels of every try are launched once
+    instead of once per try.
+    """
+    return torch.func.vmap(CcsReporter.lossm, in_dims=(None, 0, None))(
+        reporter, logits, labels
+    )
+
+
+def _pseudo_label_pair(x0: Tensor, x1: Tensor) -> tuple[Tensor, Tensor]:
+    """Concatenate a contrast pair and build its pseudo-labels.
+
+    Writes both halves into preallocated buffers instead of going through
+    `torch.cat`, then returns a `(b v) d` view of the hiddens along with the
+    `(b v)` pseudo-labels, which are 0 for `x0` and 1 for `x1`.
+    """
+    n0, n1 = len(x0), len(x1)
+    d = x0.shape[-1]
+
+    x = x0.new_empty((n0 + n1, *x0.shape[1:]))
+    x[:n0].copy_(x0)
+    x[n0:].copy_(x1)
+
+    # b v d -> (b v) d
+    x = x.view(-1, d)
+    split = x0[..., 0].numel()
+
+    y = x.new_empty(len(x))
+    y[:split].zero_()
+    y[split:].fill_(1.0)
+    return x, y
+
+
 @dataclass
 class CcsReporterConfig(ReporterConfig):
     """
@@ -47,7 +126,8 @@ class CcsReporterConfig(ReporterConfig):
         lr: The learning rate to use. Ignored when `optimizer` is `"lbfgs"`.
             Defaults to 1e-2.
         num_epochs: The number of epochs to train for. Defaults to 1000.
-        num_tries: The number of times to try training the reporter. Defaults to 10.
+        num_tries: The number of times to try training the reporter. Ignored when
+            `init` is `"zero"`, since every try would be identical. Defaults to 10.
         optimizer: The optimizer to use. Defaults to "adam".
         weight_decay: The weight decay or L2 penalty to use. Defaults to 0.01.
     """
@@ -73,7 +153,8 @@ class CcsReporterConfig(ReporterConfig):
         return CcsReporter
 
     def __post_init__(self):
-        self.loss_dict = parse_loss(self.loss)
+        # Copy since parse_loss caches its results
+        self.loss_dict = dict(parse_loss(tuple(self.loss)))
 
         # standardize the loss field
         self.loss = [f"{coef}*{name}" for name, coef in self.loss_dict.items()]
@@ -100,6 +181,9 @@ class CcsReporter(Reporter):
         self.config = cfg
         self.in_features = in_features
 
+        # Resolve the loss terms once so the train loops don't hit LOSSES every step
+        self._loss_fns = [(LOSSES[name], coef) for name, coef in cfg.loss_dict.items()]
+
         # Learnable Platt scaling parameters
         self.bias = nn.Parameter(torch.zeros(1, device=device, dtype=dtype))
         self.scale = nn.Parameter(torch.ones(1, device=device, dtype=dtype))
@@ -107,8 +191,12 @@ class CcsReporter(Reporter):
         hidden_size = cfg.hidden_size or 4 * in_features // 3
 
         num_norms = 4
-        self.norms = [Normalizer((in_features,), device=device, dtype=dtype) for _ in range(num_norms)]
-
+        self.norms = nn.ModuleList(
+            [
+                Normalizer((in_features,), device=device, dtype=dtype)
+                for _ in range(num_norms)
+            ]
+        )
 
         self.norm = SpectralNorm(in_features, 1, device=device, dtype=dtype)
         self.probe = nn.Sequential(
@@ -139,6 +227,16 @@ class CcsReporter(Reporter):
                 )
             )
 
+        # Cached so the LBFGS closures don't rebuild the parameter list every call
+        self._param_list = list(self.parameters())
+
+    @property
+    def _num_tries(self) -> int:
+        """The number of tries to actually run when fitting the probe."""
+        # With zero init every try starts from the same point, and both optimizers
+        # are deterministic, so the extra tries would just repeat the first one
+        return 1 if self.config.init == "zero" else self.config.num_tries
+
     @torch.no_grad()
     def check_separability(
         self,
@@ -160,30 +258,16 @@ class CcsReporter(Reporter):
         val_x0, val_x1 = map(self.norm, val_pair)
 
         pseudo_clf = Classifier(x0.shape[-1], device=x0.device)  # type: ignore
-        pseudo_train = torch.cat(
-            [
-                torch.zeros_like(x0[..., 0]),
-                torch.ones_like(x1[..., 0]),
-            ]
-        ).flatten()
-        pseudo_val = torch.cat(
-            [
-                torch.zeros_like(val_x0[..., 0]),
-                torch.ones_like(val_x1[..., 0]),
-            ]
-        ).flatten()
+        train_x, pseudo_train = _pseudo_label_pair(x0, x1)
+        val_x, pseudo_val = _pseudo_label_pair(val_x0, val_x1)
 
         pseudo_clf.fit(
-            # b v d -> (b v) d
-            torch.cat([x0, x1]).flatten(0, 1),
+            train_x,
             pseudo_train,
             # Use the same weight decay as the reporter
             l2_penalty=self.config.weight_decay,
         )
-        pseudo_preds = pseudo_clf(
-            # b v d -> (b v) d
-            torch.cat([val_x0, val_x1]).flatten(0, 1)
-        ).squeeze(-1)
+        pseudo_preds = pseudo_clf(val_x).squeeze(-1)
 
         # Edge case where the classifier learns to set its weights to zero
         # Technically AUROC is not defined here but we "fill in" the value of 0.5
@@ -194,10 +278,11 @@ class CcsReporter(Reporter):
             return roc_auc(pseudo_val, pseudo_preds).item()
 
     def unsupervised_loss(self, logit0: Tensor, logit1: Tensor) -> Tensor:
-        loss = sum(
-            LOSSES[name](logit0, logit1, coef)
-            for name, coef in self.config.loss_dict.items()
-        )
+        (fn, coef), *rest = self._loss_fns
+        loss = fn(logit0, logit1, coef)
+        for fn, coef in rest:
+            loss = loss + fn(logit0, logit1, coef)
+
         return assert_type(Tensor, loss)
 
     def reset_parameters(self):
@@ -228,8 +313,7 @@ class CcsReporter(Reporter):
                     layer.reset_parameters()
 
         elif self.config.init == "zero":
-            for param in self.parameters():
-                param.data.zero_()
+            torch._foreach_zero_([param.data for param in self._param_list])
         elif self.config.init != "pca":
             raise ValueError(f"Unknown init: {self.config.init}")
 
@@ -267,11 +351,10 @@ class CcsReporter(Reporter):
 
             alpha = self.config.supervised_weight
             preds = p0.add(1 - p1).mul(0.5).squeeze(-1)
-            # broadcast the labels, and flatten the predictions
-            # so that both are 1D tensors
-            broadcast_labels = labels.repeat_interleave(preds.shape[1]).float()
-            flattened_preds = preds.cpu().flatten()
-            bce_loss = bce(flattened_preds, broadcast_labels.type_as(flattened_preds))
+            # broadcast the labels across the variants; expand() is a view, and the
+            # BCE averages over every element so there's no need to flatten
+            broadcast_labels = labels.type_as(preds)[:, None].expand_as(preds)
+            bce_loss = bce(preds, broadcast_labels)
             loss = alpha * bce_loss + (1 - alpha) * loss
 
         elif self.config.supervised_weight > 0:
@@ -310,7 +393,7 @@ class CcsReporter(Reporter):
         best_loss = torch.inf
         best_state: dict[str, Tensor] = {}  # State dict of the best run
 
-        for i in range(self.config.num_tries):
+        for i in range(self._num_tries):
             self.reset_parameters()
 
             # This is sort of inefficient but whatever
@@ -328,7 +411,9 @@ class CcsReporter(Reporter):
 
             if loss < best_loss:
                 best_loss = loss
-                best_state = deepcopy(self.state_dict())
+                best_state = {
+                    k: v.detach().clone() for k, v in self.state_dict().items()
+                }
 
         if not math.isfinite(best_loss):
             raise RuntimeError("Got NaN/infinite loss during training")
@@ -344,16 +429,24 @@ class CcsReporter(Reporter):
     ) -> float:
         """Adam train loop, returning the final loss. Modifies params in-place."""
 
+        # The fused kernel updates every parameter in one launch, but is CUDA-only
+        fused = self.bias.is_cuda
         optimizer = torch.optim.AdamW(
-            self.parameters(), lr=self.config.lr, weight_decay=self.config.weight_decay
+            self.parameters(),
+            lr=self.config.lr,
+            weight_decay=self.config.weight_decay,
+            foreach=not fused,
+            fused=fused,
         )
 
+        forward = _maybe_compile(CcsReporter.forward, x_pos.device)
+
         loss = torch.inf
         for _ in range(self.config.num_epochs):
             optimizer.zero_grad()
 
             # We already normalized in fit()
-            loss = self.loss(self(x_neg), self(x_pos), labels)
+            loss = self.loss(forward(self, x_neg), forward(self, x_pos), labels)
             loss.backward()
             optimizer.step()
 
@@ -374,6 +467,8 @@ class CcsReporter(Reporter):
             tolerance_change=torch.finfo(x_pos.dtype).eps,
             tolerance_grad=torch.finfo(x_pos.dtype).eps,
         )
+        forward = _maybe_compile(CcsReporter.forward, x_pos.device)
+
         # Raw unsupervised loss, WITHOUT regularization
         loss = torch.inf
 
@@ -382,13 +477,11 @@ class CcsReporter(Reporter):
             optimizer.zero_grad()
 
             # We already normalized in fit()
-            loss = self.loss(self(x_neg), self(x_pos), labels)
-            regularizer = 0.0
-
+            loss = self.loss(forward(self, x_neg), forward(self, x_pos), labels)
             # We explicitly add L2 regularization to the loss, since LBFGS
             # doesn't have a weight_decay parameter
-            for param in self.parameters():
-                regularizer += self.config.weight_decay * param.norm() ** 2 / 2
+            sq_norms = torch.stack([p.square().sum() for p in self._param_list])
+            regularizer = self.config.weight_decay * sq_norms.sum() / 2
 
             regularized = loss + regularizer
             regularized.backward()
@@ -418,53 +511,52 @@ class CcsReporter(Reporter):
             ValueError: If `optimizer` is not "adam" or "lbfgs".
             RuntimeError: If the best loss is not finite.
         """
-        #print(hiddens)
-
-        #("Hiddens shape is " + str(hiddens.shape))
-
-        # Loop through the third dimension of hiddens and unbind the tensors
-        x_tensors = [tensor for tensor in hiddens.unbind(2)]
-        print(labels)
-        print("Length " + str(len(x_tensors)))
-        print("Shape " + str(x_tensors[0].shape))
-        # Fit normalizers
-        #self.neg_norm.fit(x_neg)
-        #self.pos_norm.fit(x_pos)
-        #x_neg, x_pos = self.neg_norm(x_neg), self.pos_norm(x_pos)
-
-        for i in range(4):
-            #print("fitting")
-            self.norms[i].fit(x_tensors[i])
-            #print("fitting finished")
-        x_tensors = [self.norms[i](x_tensors[i]) for i in range(len(x_tensors))]
+        # CCS probe training is robust to the reduced mantissa of TF32, and letting
+        # the probe GEMMs and PCA init use tensor cores makes them much faster on
+        # Ampere and newer GPUs
+        with _tf32_matmuls(hiddens.is_cuda):
+            return self._fit(hiddens, labels)
+
+    def _fit(self, hiddens: Tensor, labels: Optional[Tensor] = None) -> float:
+        """Implementation of `fit()`, run with TF32 matmuls allowed on GPU."""
+        # Stack the classes along a leading dimension: b v k d -> k b v d. This lets
+        # us fit the normalizers with one reduction, and run the probe as a single
+        # batched GEMM per epoch
+        x = torch.stack(hiddens.unbind(2))
+        self.fit_norms(x)
+        x = torch.stack([norm(t) for norm, t in zip(self.norms, x)])
+
+        # Linear probes trained with Adam can run all the tries at once
+        batchable = self.config.optimizer == "adam" and len(self.probe) == 1
+        if batchable and self._num_tries > 1:
+            best_loss = self.trainm_tries_adam(x, labels)
+            if not math.isfinite(best_loss):
+                raise RuntimeError("Got NaN/infinite loss during training")
+
+            return best_loss
 
         # Record the best acc
         # Record the best acc, loss, and params found so far
         best_loss = torch.inf
         best_state: dict[str, Tensor] = {}  # State dict of the best run
 
-        for i in range(self.config.num_tries):
-            self.reset_parameters()
-
-            # This is sort of inefficient but whatever
-            if self.config.init == "pca":
-                #diffs = torch.flatten(x_pos - x_neg, 0, 1)
-                diffs = torch.flatten(1 - torch.sum((x_tensors)), 0, 1)
-                _, __, V = torch.pca_lowrank(diffs, q=i + 1)
-                self.probe[0].weight.data = V[:, -1, None].T
+        for i in range(self._num_tries):
+            self.reset_try(x, i)
 
             if self.config.optimizer == "lbfgs":
-                loss = self.trainm_loop_lbfgs(x_tensors, labels)
+                loss = self.trainm_loop_lbfgs(x, labels)
                 #loss = self.train_loop_lbfgs(x_pos, x_neg, labels)
             elif self.config.optimizer == "adam":
-                loss = self.trainm_loop_adam(x_tensors, labels)
+                loss = self.trainm_loop_adam(x, labels)
                 #loss = self.train_loop_adam(x_pos, x_neg, labels)
             else:
                 raise ValueError(f"Optimizer {self.config.optimizer} is not supported")
 
             if loss < best_loss:
                 best_loss = loss
-                best_state = deepcopy(self.state_dict())
+                best_state = {
+                    k: v.detach().clone() for k, v in self.state_dict().items()
+                }
 
         if not math.isfinite(best_loss):
             raise RuntimeError("Got NaN/infinite loss during training")
@@ -474,27 +566,71 @@ class CcsReporter(Reporter):
 
 
 
-    def unsupervised_lossm(self, logits: [Tensor]) -> Tensor:
-       
-        #print("name of loss function: " + str(name))
-        loss = sum(
-            LOSSES[name](logits, coef)
-            for name, coef in self.config.loss_dict.items()
-        )
-        
+    @torch.no_grad()
+    def fit_norms(self, x: Tensor):
+        """Fit the per-class normalizers to the hiddens `x`, stacked as [k, b, v, d].
+
+        Equivalent to calling `self.norms[i].fit(x[i])` for every class, but computes
+        the statistics of all the classes with a single reduction.
+
+        Raises:
+            ValueError: If the number of classes doesn't match the number of
+                normalizers.
+        """
+        # There is one normalizer per class, so don't silently drop classes
+        if len(x) != len(self.norms):
+            raise ValueError(
+                f"Expected {len(self.norms)} classes, but got {len(x)} instead"
+            )
+
+        std, mean = torch.std_mean(x, dim=(1, 2), correction=0)
+        for norm, mu, sigma in zip(self.norms, mean, std):
+            norm.mean.copy_(mu)
+            norm.std.copy_(sigma.clamp_min(norm.eps))
+
+    def reset_try(self, x: Tensor, i: int):
+        """Reset the parameters of the probe for the `i`-th try of `fit()`.
+
+        Args:
+            x: The normalized hiddens for every class, stacked as [k, b, v, d].
+            i: The index of the try, used to pick the principal component when
+                init is "pca".
+        """
+        self.reset_parameters()
+
+        # This is sort of inefficient but whatever
+        if self.config.init == "pca":
+            #diffs = torch.flatten(x_pos - x_neg, 0, 1)
+            diffs = torch.flatten(1 - x.sum(dim=0), 0, 1)
+            _, __, V = torch.pca_lowrank(diffs, q=i + 1)
+            probe = cast(nn.Linear, self.probe[0])
+            probe.weight.data = V[:, -1, None].T
+
+            # reset_parameters() leaves the probe alone for PCA, so without this each
+            # try would start from the bias the previous try trained
+            if probe.bias is not None:
+                probe.bias.data.zero_()
+
+    def unsupervised_lossm(self, logits: list[Tensor]) -> Tensor:
+        (fn, coef), *rest = self._loss_fns
+        loss = fn(logits, coef)
+        for fn, coef in rest:
+            loss = loss + fn(logits, coef)
+
         return assert_type(Tensor, loss)
 
 
     def lossm(
         self,
-        logits: list[Tensor],
+        logits: Tensor,
         labels: Optional[Tensor] = None,
     ) -> Tensor:
         """Return the loss of the reporter on the contrast set.
 
         Args:
-            logits: A list of raw score outputs of the reporter, where the first
-                element is the positive term and the rest are negative terms.
+            logits: The raw score outputs of the reporter for every class, stacked
+                as [k, b, v], where the first class is the positive term and the
+                rest are negative terms.
             labels: The labels of the contrast set. Defaults to None.
 
         Returns:
@@ -503,24 +639,24 @@ class CcsReporter(Reporter):
         Raises:
             ValueError: If `supervised_weight > 0` but `labels` is None.
         """
-        loss = self.unsupervised_lossm(logits)
+        loss = self.unsupervised_lossm(list(logits.unbind(0)))
 
         # If labels are provided, use them to compute a supervised loss
         if labels is not None:
             num_labels = len(labels)
-            assert num_labels <= len(logits[0]), "Too many labels provided"
-            p0 = logits[0][:num_labels].sigmoid()
-            ps = [logit[:num_labels].sigmoid() for logit in logits]
-
+            assert num_labels <= logits.shape[1], "Too many labels provided"
 
             alpha = self.config.supervised_weight
-            stacked_tensors = torch.stack(ps, dim=-1)
-            preds, _ = torch.max(stacked_tensors, dim=-1)
-            broadcast_labels = labels.repeat_interleave(preds.shape[1]).float()
-            #print("blabels " + str(broadcast_labels.shape))
-            #print(logits[0][0])
-            flattened_preds = preds.cpu().flatten()
-            bce_loss = bce(flattened_preds, broadcast_labels.type_as(flattened_preds))
+            # The sigmoid is monotonic, so we take the max over the raw logits and
+            # only apply it once. Use max(dim) rather than pairwise torch.maximum
+            # or amax: on ties they split the gradient between the classes, while
+            # max(dim) sends all of it to one. With zero init every logit ties on
+            # the first step.
+            max_logits, _ = logits[:, :num_labels].max(dim=0)
+            preds = max_logits.sigmoid()
+            # broadcast the labels across the variants without copying them
+            broadcast_labels = labels.type_as(preds)[:, None].expand_as(preds)
+            bce_loss = bce(preds, broadcast_labels)
             loss = alpha * bce_loss + (1 - alpha) * loss
 
         elif self.config.supervised_weight > 0:
@@ -532,54 +668,147 @@ class CcsReporter(Reporter):
 
     def trainm_loop_adam(
         self,
-        x_tensors: [Tensor],
+        x: Tensor,
         labels: Optional[Tensor] = None,
     ) -> float:
-        """Adam train loop, returning the final loss. Modifies params in-place."""
+        """Adam train loop, returning the final loss. Modifies params in-place.
+
+        `x` holds the normalized hiddens for every class, stacked as [k, b, v, d].
+        """
 
+        # The fused kernel updates every parameter in one launch, but is CUDA-only
+        fused = self.bias.is_cuda
         optimizer = torch.optim.AdamW(
-            self.parameters(), lr=self.config.lr, weight_decay=self.config.weight_decay
+            self.parameters(),
+            lr=self.config.lr,
+            weight_decay=self.config.weight_decay,
+            foreach=not fused,
+            fused=fused,
         )
 
+        # SpectralNorm has no trainable parameters, so we only need to apply it once
+        x = self.norm(x)
+        probe = _maybe_compile(nn.Sequential.forward, x.device)
+        lossm = _maybe_compile(CcsReporter.lossm, x.device)
+
         loss = torch.inf
         for _ in range(self.config.num_epochs):
             optimizer.zero_grad()
 
-            loss = self.lossm(self(x_tensors), labels)
+            logits = probe(self.probe, x).squeeze(-1)
+            loss = lossm(self, logits, labels)
             loss.backward()
             optimizer.step()
 
         return float(loss)
 
 
+    def trainm_tries_adam(
+        self,
+        x: Tensor,
+        labels: Optional[Tensor] = None,
+    ) -> float:
+        """Adam train loop that trains all `num_tries` tries of a linear probe at once.
+
+        The weights of every try are stacked along a leading "try" dimension, so
+        one einsum computes the logits of all the tries, and a single optimizer
+        step updates all of them. The tries share no parameters, so backpropagating
+        the sum of their losses gives each try exactly the gradient it would get on
+        its own. The best try is copied into the probe at the end.
+
+        The losses in `LOSSES` reduce to a scalar, so `lossm()` is mapped over the
+        try dimension with `torch.func.vmap`. That way the loss kernels are also
+        launched once per epoch, rather than once per try.
+
+        `x` holds the normalized hiddens for every class, stacked as [k, b, v, d].
+        Returns the final loss of the best try.
+        """
+        assert len(self.probe) == 1, "Only linear probes can batch their tries"
+        probe = cast(nn.Linear, self.probe[0])
+
+        weights, biases = [], []
+        for i in range(self.config.num_tries):
+            self.reset_try(x, i)
+            weights.append(probe.weight.detach().clone())
+            if probe.bias is not None:
+                biases.append(probe.bias.detach().clone())
+
+        # t o d, and t o for the bias
+        W = nn.Parameter(torch.stack(weights))
+        b = nn.Parameter(torch.stack(biases)) if biases else None
+        params = [W] if b is None else [W, b]
+
+        fused = W.is_cuda
+        optimizer = torch.optim.AdamW(
+            params,
+            lr=self.config.lr,
+            weight_decay=self.config.weight_decay,
+            foreach=not fused,
+            fused=fused,
+        )
+
+        # SpectralNorm has no trainable parameters, so we only need to apply it once
+        x = self.norm(x)
+        lossm_per_try = _maybe_compile(_lossm_per_try, x.device)
+
+        losses = torch.full((self.config.num_tries,), torch.inf)
+        for _ in range(self.config.num_epochs):
+            optimizer.zero_grad()
+
+            logits = torch.einsum("tod,kbvd->tkbvo", W, x)
+            if b is not None:
+                logits = logits + b[:, None, None, None]
+
+            losses = lossm_per_try(self, logits.squeeze(-1), labels)
+            losses.sum().backward()
+            optimizer.step()
+
+        # Like the sequential loop in fit(), never pick a try with a NaN loss
+        losses = losses.detach()
+        best = int(losses.nan_to_num(nan=torch.inf).argmin())
+        with torch.no_grad():
+            probe.weight.copy_(W[best])
+            if b is not None:
+                probe.bias.copy_(b[best])
+
+        return float(losses[best])
+
     def trainm_loop_lbfgs(
         self,
-        x_tensors: [Tensor],
+        x: Tensor,
         labels: Optional[Tensor] = None,
     ) -> float:
-        """LBFGS train loop, returning the final loss. Modifies params in-place."""
+        """LBFGS train loop, returning the final loss. Modifies params in-place.
+
+        `x` holds the normalized hiddens for every class, stacked as [k, b, v, d].
+        """
 
+        eps = torch.finfo(x.dtype).eps
         optimizer = torch.optim.LBFGS(
             self.parameters(),
             line_search_fn="strong_wolfe",
             max_iter=self.config.num_epochs,
-            tolerance_change=torch.finfo(x_tensors[0].dtype).eps,
-            tolerance_grad=torch.finfo(x_tensors[0].dtype).eps,
+            tolerance_change=eps,
+            tolerance_grad=eps,
         )
         # Raw unsupervised loss, WITHOUT regularization
         loss = torch.inf
 
+        # The line search can call the closure many times per step, and SpectralNorm
+        # has no trainable parameters, so we apply it once outside the closure
+        x = self.norm(x)
+        probe = _maybe_compile(nn.Sequential.forward, x.device)
+        lossm = _maybe_compile(CcsReporter.lossm, x.device)
+
         def closure():
             nonlocal loss
             optimizer.zero_grad()
-            correct_tensors = [self(tense) for tense in x_tensors]
-            loss = self.lossm(correct_tensors, labels)
-            regularizer = 0.0
-
+            logits = probe(self.probe, x).squeeze(-1)
+            loss = lossm(self, logits, labels)
             # We explicitly add L2 regularization to the loss, since LBFGS
             # doesn't have a weight_decay parameter
-            for param in self.parameters():
-                regularizer += self.config.weight_decay * param.norm() ** 2 / 2
+            sq_norms = torch.stack([p.square().sum() for p in self._param_list])
+            regularizer = self.config.weight_decay * sq_norms.sum() / 2
 
             regularized = loss + regularizer
             regularized.backward()
@@ -0,0 +1,53 @@
+import torch
+from torch import Tensor, nn
+
+
+class Normalizer(nn.Module):
+    """Standardizes inputs using statistics fit over all but the trailing dims.
+
+    Basically `BatchNorm` with a less annoying default axis ordering.
+    """
+
+    mean: Tensor
+    """Mean of the data passed to `fit()`."""
+
+    std: Tensor
+    """Standard deviation of the data passed to `fit()`."""
+
+    def __init__(
+        self,
+        normalized_shape: tuple[int, ...],
+        *,
+        device: str | torch.device | None = None,
+        dtype: torch.dtype | None = None,
+        eps: float = 1e-5,
+    ):
+        super().__init__()
+
+        self.eps = eps
+        self.normalized_shape = normalized_shape
+        self.register_buffer(
+            "mean", torch.zeros(*normalized_shape, device=device, dtype=dtype)
+        )
+        self.register_buffer(
+            "std", torch.ones(*normalized_shape, device=device, dtype=dtype)
+        )
+
+    def forward(self, x: Tensor) -> Tensor:
+        """Normalize `x` using the statistics from `fit()`."""
+        return (x - self.mean) / self.std
+
+    @torch.no_grad()
+    def fit(self, x: Tensor) -> "Normalizer":
+        """Fit the mean and standard deviation to `x`."""
+        num_dims = len(self.normalized_shape)
+        if x.shape[-num_dims:] != self.normalized_shape:
+            raise ValueError(
+                f"Expected trailing shape {self.normalized_shape}, but got {x.shape}"
+            )
+
+        dims = tuple(range(x.ndim - num_dims))
+        std, mean = torch.std_mean(x, dim=dims, correction=0)
+        self.mean.copy_(mean)
+        self.std.copy_(std.clamp_min(self.eps))
+        return self
@@ -0,0 +1,195 @@
+import pytest
+import torch
+
+from elk.training import CcsReporter, CcsReporterConfig
+from elk.training.ccs_reporter import _pseudo_label_pair, _tf32_matmuls
+from elk.training.normalizer import Normalizer
+
+
+@pytest.mark.parametrize("n0,n1", [(7, 7), (7, 3), (2, 9)])
+def test_pseudo_label_pair(n0: int, n1: int):
+    torch.manual_seed(42)
+    num_variants = 4
+    hidden_size = 5
+
+    x0 = torch.randn(n0, num_variants, hidden_size, dtype=torch.float64)
+    x1 = torch.randn(n1, num_variants, hidden_size, dtype=torch.float64)
+    x, y = _pseudo_label_pair(x0, x1)
+
+    # Compare against the torch.cat construction it replaced
+    expected_x = torch.cat([x0, x1]).flatten(0, 1)
+    expected_y = torch.cat(
+        [
+            torch.zeros_like(x0[..., 0]),
+            torch.ones_like(x1[..., 0]),
+        ]
+    ).flatten()
+
+    torch.testing.assert_close(x, expected_x)
+    torch.testing.assert_close(y, expected_y)
+    assert x.dtype == y.dtype == x0.dtype
+
+
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("init", ["default", "pca"])
+def test_batched_tries_match_sequential(init: str, bias: bool):
+    num_tries = 4
+    k, n, v, d = 4, 16, 3, 6
+
+    torch.manual_seed(42)
+    x = torch.randn(k, n, v, d)
+    labels = torch.randint(0, 2, (n,))
+
+    cfg = CcsReporterConfig(
+        bias=bias,
+        init=init,  # type: ignore[arg-type]
+        optimizer="adam",
+        num_epochs=50,
+        num_tries=num_tries,
+        supervised_weight=0.5,
+    )
+    reporter = CcsReporter(cfg, d)
+    classes = torch.arange(k).repeat_interleave(n * v)
+    reporter.norm.update(x=x.flatten(0, 2), y=classes)
+    probe = reporter.probe[0]
+
+    # Each try gets the same initialization in both paths as long as the RNG
+    # starts from the same state, since training itself doesn't draw from it
+    torch.manual_seed(0)
+    batched_loss = reporter.trainm_tries_adam(x, labels)
+    batched_state = {name: t.clone() for name, t in probe.state_dict().items()}
+
+    # Mirror the sequential loop in fit(): each try is reset and trained in turn,
+    # so any state leaking from one try into the next shows up here
+    torch.manual_seed(0)
+    best_loss = torch.inf
+    best_state = {}
+    for i in range(num_tries):
+        reporter.reset_try(x, i)
+        loss = reporter.trainm_loop_adam(x, labels)
+        if loss < best_loss:
+            best_loss = loss
+            best_state = {
+                name: t.clone() for name, t in probe.state_dict().items()
+            }
+
+    assert batched_loss == pytest.approx(best_loss, rel=1e-4)
+    assert batched_state.keys() == best_state.keys() == (
+        {"weight", "bias"} if bias else {"weight"}
+    )
+    for name, t in best_state.items():
+        torch.testing.assert_close(batched_state[name], t)
+
+
+def test_import_keeps_matmul_precision():
+    # Importing elk must not change the precision of every matmul in the process
+    import elk  # noqa: F401
+
+    assert torch.get_float32_matmul_precision() == "highest"
+
+
+def test_tf32_matmuls_restores_precision():
+    with _tf32_matmuls(True):
+        assert torch.get_float32_matmul_precision() == "high"
+    assert torch.get_float32_matmul_precision() == "highest"
+
+    with pytest.raises(RuntimeError):
+        with _tf32_matmuls(True):
+            raise RuntimeError
+    assert torch.get_float32_matmul_precision() == "highest"
+
+
+@pytest.mark.parametrize("init,expected", [("zero", 1), ("default", 5), ("pca", 5)])
+def test_num_tries(init: str, expected: int):
+    cfg = CcsReporterConfig(init=init, num_tries=5)  # type: ignore[arg-type]
+    assert CcsReporter(cfg, 6)._num_tries == expected
+
+
+def test_fit_norms_matches_separate_fits():
+    k, n, v, d = 4, 20, 3, 6
+
+    torch.manual_seed(42)
+    # Give each class a different scale so that mixing them up would be caught
+    scale = torch.arange(1, k + 1, dtype=torch.float64).view(k, 1, 1, 1)
+    x = scale * torch.randn(k, n, v, d, dtype=torch.float64)
+    x[1, ..., 0] = 2.0  # A constant feature, whose std gets clamped
+
+    reporter = CcsReporter(CcsReporterConfig(), d, dtype=torch.float64)
+    reporter.fit_norms(x)
+
+    for norm, x_i in zip(reporter.norms, x):
+        expected = Normalizer((d,), dtype=torch.float64).fit(x_i)
+        torch.testing.assert_close(norm.mean, expected.mean)
+        torch.testing.assert_close(norm.std, expected.std)
+
+    with pytest.raises(ValueError):
+        reporter.fit_norms(x[:3])
+
+
+@pytest.mark.parametrize(
+    "optimizer,init,num_layers,expected_path,expected_calls",
+    [
+        ("adam", "default", 1, "trainm_tries_adam", 1),
+        ("adam", "default", 2, "trainm_loop_adam", 3),
+        ("adam", "zero", 1, "trainm_loop_adam", 1),
+        ("lbfgs", "default", 1, "trainm_loop_lbfgs", 3),
+        ("lbfgs", "pca", 1, "trainm_loop_lbfgs", 3),
+        ("lbfgs", "zero", 1, "trainm_loop_lbfgs", 1),
+    ],
+)
+def test_fit(
+    monkeypatch: pytest.MonkeyPatch,
+    optimizer: str,
+    init: str,
+    num_layers: int,
+    expected_path: str,
+    expected_calls: int,
+):
+    k, n, v, d = 4, 16, 3, 6
+
+    torch.manual_seed(42)
+    hiddens = torch.randn(n, v, k, d)
+    labels = torch.randint(0, 2, (n,))
+
+    cfg = CcsReporterConfig(
+        init=init,  # type: ignore[arg-type]
+        num_epochs=20,
+        num_layers=num_layers,
+        num_tries=3,
+        optimizer=optimizer,  # type: ignore[arg-type]
+        supervised_weight=0.5,
+    )
+    reporter = CcsReporter(cfg, d)
+
+    # fit() doesn't update the SpectralNorm itself, so we have to do it here
+    classes = torch.arange(k).repeat(n * v)
+    reporter.norm.update(x=hiddens.flatten(0, 2), y=classes)
+
+    # Record which training loop ran, and its loss and final probe state
+    paths: list[str] = []
+    runs: list[tuple[float, dict[str, torch.Tensor]]] = []
+
+    def spy(name: str):
+        train = getattr(reporter, name)
+
+        def wrapper(*args, **kwargs):
+            loss = train(*args, **kwargs)
+            paths.append(name)
+            runs.append(
+                (loss, {n: t.clone() for n, t in reporter.probe.state_dict().items()})
+            )
+            return loss
+
+        return wrapper
+
+    for name in ("trainm_tries_adam", "trainm_loop_adam", "trainm_loop_lbfgs"):
+        monkeypatch.setattr(reporter, name, spy(name))
+
+    loss = reporter.fit(hiddens, labels)
+    assert paths == [expected_path] * expected_calls
+
+    # fit() returns the best loss and restores the probe state of that run
+    best_loss, best_state = min(runs, key=lambda run: run[0])
+    assert loss == best_loss
+    for name, t in reporter.probe.state_dict().items():
+        torch.testing.assert_close(t, best_state[name])
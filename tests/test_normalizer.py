@@ -0,0 +1,42 @@
+import pytest
+import torch
+
+from elk.training.normalizer import Normalizer
+
+
+def test_normalizer():
+    torch.manual_seed(42)
+    n, v, d = 50, 3, 4
+    x = 3 * torch.randn(n, v, d, dtype=torch.float64) + 2
+
+    norm = Normalizer((d,), dtype=torch.float64)
+    assert norm.fit(x) is norm
+
+    # Statistics are taken over every dimension but the normalized one
+    flat = x.flatten(0, 1)
+    torch.testing.assert_close(norm.mean, flat.mean(dim=0))
+    torch.testing.assert_close(norm.std, flat.std(dim=0, unbiased=False))
+
+    # The output is standardized, and keeps the input's shape
+    y = norm(x)
+    assert y.shape == x.shape
+    torch.testing.assert_close(y.flatten(0, 1).mean(dim=0), torch.zeros(d).double())
+    torch.testing.assert_close(
+        y.flatten(0, 1).std(dim=0, unbiased=False), torch.ones(d).double()
+    )
+
+
+def test_normalizer_constant_feature():
+    norm = Normalizer((2,), eps=1e-3)
+    x = torch.tensor([[1.0, 5.0], [3.0, 5.0]])
+    norm.fit(x)
+
+    # The std of a constant feature is clamped so that forward() stays finite
+    torch.testing.assert_close(norm.std, torch.tensor([1.0, 1e-3]))
+    assert norm(x).isfinite().all()
+
+
+def test_normalizer_shape_mismatch():
+    norm = Normalizer((4,))
+    with pytest.raises(ValueError):
+        norm.fit(torch.randn(10, 5))
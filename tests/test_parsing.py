@@ -0,0 +1,26 @@
+import pytest
+
+from elk.parsing import parse_loss
+from elk.training import CcsReporterConfig
+
+
+def test_parse_loss():
+    terms = ("0.5*ccs", "consistency_squared")
+    expected = {"ccs": 0.5, "consistency_squared": 1.0}
+    assert parse_loss(terms) == expected
+    assert parse_loss(terms) == expected
+
+    # Lists aren't hashable, so they can't hit the cache
+    with pytest.raises(TypeError):
+        parse_loss(["ccs"])  # type: ignore[arg-type]
+
+
+def test_parse_loss_cache_not_shared_with_config():
+    cfg = CcsReporterConfig(loss=["ccs"])
+    assert cfg.loss_dict == {"ccs": 1.0}
+
+    # Mutating the config must not corrupt the cached result
+    cfg.loss_dict["ccs"] = 3.0
+    cfg.loss_dict["confidence_squared"] = 1.0
+    assert parse_loss(("ccs",)) == {"ccs": 1.0}
+    assert CcsReporterConfig(loss=["ccs"]).loss_dict == {"ccs": 1.0}